@@ -2,6 +2,7 @@ import json
 import os
 import time
 import hashlib
+import tempfile
 from config.settings import CACHE_DIR, CACHE_TTL, CACHE_MAX_SIZE
 import pickle
 
@@ -24,20 +25,22 @@ class CacheManager:
         cache_key = self._get_cache_key(query)
         cache_file = self._get_cache_file_path(cache_key)
         
-        if os.path.exists(cache_file):
-            try:
-                with open(cache_file, 'rb') as f:
-                    cached_data = pickle.load(f)
-                    
-                # Check if cache is still valid
-                if time.time() - cached_data['timestamp'] < CACHE_TTL:
-                    return cached_data['result']
-                else:
-                    # Remove expired cache
-                    os.remove(cache_file)
-            except Exception as e:
-                print(f"Error reading cache: {e}")
+        try:
+            with open(cache_file, 'rb') as f:
+                cached_data = pickle.load(f)
                 
+            # Check if cache is still valid
+            if time.time() - cached_data['timestamp'] < CACHE_TTL:
+                return cached_data['result']
+            else:
+                # Remove expired cache
+                os.remove(cache_file)
+        except FileNotFoundError:
+            # Not cached, or removed by another thread in the meantime
+            pass
+        except Exception as e:
+            print(f"Error reading cache: {e}")
+            
         return None
     
     def cache_result(self, query, result):
@@ -55,8 +58,16 @@ class CacheManager:
         }
         
         try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(cached_data, f)
+            # Write to a temporary file and rename it into place, so readers
+            # never see a partially written cache file
+            fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(cached_data, f)
+                os.replace(tmp_file, cache_file)
+            except BaseException:
+                os.remove(tmp_file)
+                raise
         except Exception as e:
             print(f"Error writing cache: {e}")
     
@@ -70,7 +81,10 @@ class CacheManager:
                 cache_files_with_time = []
                 for f in cache_files:
                     file_path = os.path.join(self.cache_dir, f)
-                    cache_files_with_time.append((file_path, os.path.getmtime(file_path)))
+                    try:
+                        cache_files_with_time.append((file_path, os.path.getmtime(file_path)))
+                    except FileNotFoundError:
+                        continue
                     
                 # Sort by modification time (oldest first)
                 cache_files_with_time.sort(key=lambda x: x[1])
@@ -78,6 +92,10 @@ class CacheManager:
                 # Remove oldest files
                 files_to_remove = len(cache_files) - CACHE_MAX_SIZE + 10  # Keep some buffer
                 for i in range(min(files_to_remove, len(cache_files_with_time))):
-                    os.remove(cache_files_with_time[i][0])
+                    try:
+                        os.remove(cache_files_with_time[i][0])
+                    except FileNotFoundError:
+                        # Already removed by another thread
+                        pass
         except Exception as e:
             print(f"Error cleaning cache: {e}")
\ No newline at end of file
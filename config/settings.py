@@ -6,6 +6,7 @@ PROJECT_ROOT = Path(__file__).parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
 DOCUMENTS_DIR = DATA_DIR / "documents"
 CACHE_DIR = DATA_DIR / "cache"
+EMBEDDING_CACHE_DIR = DATA_DIR / "embedding_cache"
 EMBEDDINGS_DIR = PROJECT_ROOT / "embeddings"
 
 # Model configurations
@@ -20,12 +21,20 @@ FAISS_METADATA_FILE = EMBEDDINGS_DIR / "metadata.json"
 # Cache configuration
 CACHE_TTL = 24 * 60 * 60  # 24 hours in seconds
 CACHE_MAX_SIZE = 1000  # Maximum number of items in cache
+EMBEDDING_CACHE_ENABLED = True  # Reuse stored chunk embeddings when re-indexing
 
 # RAG configuration
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 50
 TOP_K_RESULTS = 5
 
+# Document loading configuration
+DOCUMENT_PATTERNS = ["*"]  # Glob filters matched against paths relative to DOCUMENTS_DIR
+DOCUMENTS_RECURSIVE = True  # Walk subdirectories of DOCUMENTS_DIR
+LOADER_WORKERS = 4  # Number of files read in parallel
+READ_BLOCK_SIZE = 1024 * 1024  # Characters read from a file at a time
+EMBED_BATCH_SIZE = 256  # Chunks encoded and indexed per batch
+
 # LLM configuration
 MAX_NEW_TOKENS = 150
 TEMPERATURE = 0.7
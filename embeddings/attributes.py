@@ -0,0 +1,113 @@
+import time
+from datetime import datetime, date
+from fnmatch import fnmatch
+import numpy as np
+
+class AttributeStore:
+    """Column store of filterable chunk attributes, indexed by FAISS id
+
+    Source files are dictionary encoded into an int32 column, ingestion times
+    are kept in a float64 column and tags in per-tag posting lists. Filters are
+    evaluated with numpy over these columns into a boolean mask of ids, which
+    FaissStorage hands to FAISS as an ID selector.
+    """
+
+    def __init__(self, metadata_list=None):
+        """Initialize the attribute store from chunk metadata"""
+        self.reset(metadata_list or [])
+
+    def reset(self, metadata_list):
+        """Rebuild all columns from chunk metadata"""
+        self.sources = []
+        self.source_codes = {}
+        self.source_column = np.zeros(0, dtype='int32')
+        self.ingested_column = np.zeros(0, dtype='float64')
+        self.tag_ids = {}
+        self.extend(metadata_list)
+
+    def copy(self):
+        """Copy the store, so the copy can be extended without affecting this one"""
+        other = AttributeStore.__new__(AttributeStore)
+        other.sources = list(self.sources)
+        other.source_codes = dict(self.source_codes)
+        other.source_column = self.source_column
+        other.ingested_column = self.ingested_column
+        other.tag_ids = {tag: list(ids) for tag, ids in self.tag_ids.items()}
+        return other
+
+    def extend(self, metadata_list):
+        """Append the attributes of new chunks, in FAISS id order"""
+        start = len(self)
+        sources = np.empty(len(metadata_list), dtype='int32')
+        ingested = np.empty(len(metadata_list), dtype='float64')
+
+        for offset, metadata in enumerate(metadata_list):
+            source = metadata.get('source_file', '')
+            if source not in self.source_codes:
+                self.source_codes[source] = len(self.sources)
+                self.sources.append(source)
+            sources[offset] = self.source_codes[source]
+            # Chunks indexed before ingestion times were recorded never match date filters
+            ingested[offset] = metadata.get('ingested_at', np.nan)
+            for tag in metadata.get('tags', []):
+                self.tag_ids.setdefault(tag, []).append(start + offset)
+
+        self.source_column = np.concatenate([self.source_column, sources])
+        self.ingested_column = np.concatenate([self.ingested_column, ingested])
+
+    def __len__(self):
+        """Get the number of chunks in the store"""
+        return len(self.source_column)
+
+    def select(self, filters):
+        """Evaluate filters into a boolean mask over FAISS ids
+
+        Supported filters:
+            source: glob (or list of globs) matched against the source file
+            tags: tag (or list of tags) that a chunk must all have
+            since / until: ingestion time bounds, as a timestamp, datetime, date or ISO string
+        """
+        unknown = set(filters) - {'source', 'tags', 'since', 'until'}
+        if unknown:
+            raise ValueError(f"Unknown filters: {', '.join(sorted(unknown))}")
+
+        mask = np.ones(len(self), dtype=bool)
+
+        if filters.get('source'):
+            patterns = _as_list(filters['source'])
+            # Globs are matched once per distinct source, not once per chunk
+            codes = [code for code, source in enumerate(self.sources)
+                     if any(fnmatch(source, pattern) for pattern in patterns)]
+            mask &= np.isin(self.source_column, codes)
+
+        for tag in _as_list(filters.get('tags')):
+            tag_mask = np.zeros(len(self), dtype=bool)
+            tag_mask[self.tag_ids.get(tag, [])] = True
+            mask &= tag_mask
+
+        if filters.get('since') is not None:
+            mask &= self.ingested_column >= _to_timestamp(filters['since'])
+        if filters.get('until') is not None:
+            mask &= self.ingested_column < _to_timestamp(filters['until'])
+
+        return mask
+
+def _as_list(value):
+    """Wrap a single filter value in a list"""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return list(value)
+
+def _to_timestamp(value):
+    """Convert a filter date to a Unix timestamp"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, date):
+        return time.mktime(value.timetuple())
+    raise ValueError(f"Unsupported date filter: {value!r}")
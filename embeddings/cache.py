@@ -0,0 +1,155 @@
+import os
+import re
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from config.settings import EMBEDDING_CACHE_DIR, EMBEDDING_MODEL_ID
+
+try:
+    import fcntl
+except ImportError:  # File locking is POSIX only; elsewhere use one process per cache
+    fcntl = None
+
+class EmbeddingCache:
+    """Content-addressed on-disk store of chunk embeddings
+
+    Embeddings are keyed by hash(model id, chunk text). Each model gets a pair of
+    append-only files: '<model>.keys' holds one 16-byte digest per row and
+    '<model>.f32' holds the matching float32 vectors, which are read through a
+    memory map so the store never has to be loaded into memory. Appends take an
+    exclusive lock on '<model>.lock', so several processes can share the cache.
+    """
+    KEY_SIZE = 16
+
+    def __init__(self, dimension, model_id=EMBEDDING_MODEL_ID, cache_dir=EMBEDDING_CACHE_DIR):
+        """Initialize the embedding cache for a model"""
+        self.dimension = dimension
+        self.model_id = model_id
+        self.cache_dir = str(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', model_id)
+        self.keys_file = os.path.join(self.cache_dir, f"{name}_{dimension}.keys")
+        self.vectors_file = os.path.join(self.cache_dir, f"{name}_{dimension}.f32")
+        self.lock_file = os.path.join(self.cache_dir, f"{name}_{dimension}.lock")
+        self.row_bytes = dimension * 4
+
+        self.rows = {}
+        self.count = 0
+        self.vectors = None
+        self.lock = threading.Lock()
+        with self.lock, self._file_lock():
+            self._repair()
+            self._refresh()
+
+    @contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock on the cache files across processes"""
+        with open(self.lock_file, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _stored_rows(self):
+        """Get the number of complete rows present in both files"""
+        return min(os.path.getsize(self.keys_file) // self.KEY_SIZE,
+                   os.path.getsize(self.vectors_file) // self.row_bytes)
+
+    def _repair(self):
+        """Create missing files and trim rows left by an interrupted write (file lock held)"""
+        for file_path in (self.keys_file, self.vectors_file):
+            open(file_path, 'ab').close()
+        count = self._stored_rows()
+        os.truncate(self.keys_file, count * self.KEY_SIZE)
+        os.truncate(self.vectors_file, count * self.row_bytes)
+
+    def _refresh(self):
+        """Index rows appended to the files since the last refresh, by any process"""
+        count = self._stored_rows()
+        if count <= self.count:
+            return
+        with open(self.keys_file, 'rb') as f:
+            f.seek(self.count * self.KEY_SIZE)
+            keys = f.read((count - self.count) * self.KEY_SIZE)
+        for offset in range(count - self.count):
+            key = keys[offset * self.KEY_SIZE:(offset + 1) * self.KEY_SIZE]
+            # Keep the first row if two processes stored the same text
+            self.rows.setdefault(key, self.count + offset)
+        self.count = count
+        self._map_vectors()
+
+    def _map_vectors(self):
+        """(Re)map the vectors file so it covers all indexed rows"""
+        if self.count:
+            self.vectors = np.memmap(self.vectors_file, dtype='float32', mode='r',
+                                     shape=(self.count, self.dimension))
+
+    def _key(self, text):
+        """Generate the cache key for a chunk text"""
+        return hashlib.md5(f"{self.model_id}\0{text}".encode('utf-8')).digest()
+
+    def get_many(self, texts):
+        """Look up embeddings for texts
+
+        Returns (embeddings, missing) where embeddings is a float32 array with one
+        row per text (rows for missing texts are zero) and missing lists the
+        indices of texts that are not cached.
+        """
+        embeddings = np.zeros((len(texts), self.dimension), dtype='float32')
+        missing = []
+        hit_positions = []
+        hit_rows = []
+        with self.lock:
+            for i, text in enumerate(texts):
+                row = self.rows.get(self._key(text))
+                if row is None:
+                    missing.append(i)
+                else:
+                    hit_positions.append(i)
+                    hit_rows.append(row)
+            if hit_rows:
+                # Fancy indexing copies out of the memory map, so callers may modify the result
+                embeddings[hit_positions] = self.vectors[hit_rows]
+        return embeddings, missing
+
+    def put_many(self, texts, embeddings):
+        """Append embeddings for texts that are not cached yet"""
+        embeddings = np.asarray(embeddings, dtype='float32').reshape(len(texts), self.dimension)
+        with self.lock, self._file_lock():
+            # Trim a row torn by a process that died mid-append, so new rows stay
+            # aligned, then pick up rows other processes appended so they are not
+            # stored twice
+            self._repair()
+            self._refresh()
+            new_keys = {}
+            for i, text in enumerate(texts):
+                key = self._key(text)
+                if key not in self.rows and key not in new_keys:
+                    new_keys[key] = i
+            if not new_keys:
+                return
+            new_positions = list(new_keys.values())
+
+            # Rows are numbered by where the data lands in the file, not by what this
+            # process has seen. Vectors are written before keys, so every stored key
+            # has its vector.
+            with open(self.vectors_file, 'ab') as f:
+                f.seek(0, os.SEEK_END)
+                start = f.tell() // self.row_bytes
+                f.write(np.ascontiguousarray(embeddings[new_positions]).tobytes())
+            with open(self.keys_file, 'ab') as f:
+                f.write(b"".join(new_keys))
+
+            for offset, key in enumerate(new_keys):
+                self.rows[key] = start + offset
+            self.count = start + len(new_keys)
+            self._map_vectors()
+
+    def __len__(self):
+        """Get the number of cached embeddings"""
+        return len(self.rows)
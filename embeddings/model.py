@@ -1,6 +1,8 @@
 import torch
+import threading
 from sentence_transformers import SentenceTransformer
-from config.settings import EMBEDDING_MODEL_ID
+from config.settings import EMBEDDING_MODEL_ID, EMBEDDING_CACHE_ENABLED
+from embeddings.cache import EmbeddingCache
 import numpy as np
 import os
 
@@ -9,14 +11,21 @@ class EmbeddingModel:
         """Initialize the embedding model"""
         self.model = None
         self.dim = None
+        self.cache = None
+        self.lock = threading.Lock()
         
     def load_model(self):
         """Load the embedding model"""
-        if self.model is None:
-            print("Loading embedding model...")
-            self.model = SentenceTransformer(EMBEDDING_MODEL_ID)
-            self.dim = self.model.get_sentence_embedding_dimension()
-            print("Embedding model loaded successfully")
+        with self.lock:
+            if self.model is None:
+                print("Loading embedding model...")
+                model = SentenceTransformer(EMBEDDING_MODEL_ID)
+                self.dim = model.get_sentence_embedding_dimension()
+                if EMBEDDING_CACHE_ENABLED:
+                    self.cache = EmbeddingCache(self.dim)
+                # Set last, so other threads only see a fully loaded model
+                self.model = model
+                print("Embedding model loaded successfully")
         
     def encode(self, texts):
         """Encode texts into embeddings"""
@@ -37,6 +46,24 @@ class EmbeddingModel:
             
         return embeddings
     
+    def encode_documents(self, texts):
+        """Encode document chunks, reusing embeddings from the persistent cache"""
+        if self.model is None:
+            self.load_model()
+            
+        if self.cache is None:
+            return self.encode(texts)
+            
+        # Only encode texts that have not been embedded before
+        embeddings, missing = self.cache.get_many(texts)
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings = self.encode(missing_texts)
+            embeddings[missing] = new_embeddings
+            self.cache.put_many(missing_texts, new_embeddings)
+            
+        return embeddings
+    
     def get_dimension(self):
         """Get the dimension of the embeddings"""
         if self.dim is None:
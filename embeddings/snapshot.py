@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import faiss
+from config.settings import EMBEDDING_MODEL_ID, CHUNK_SIZE, CHUNK_OVERLAP
+
+# Snapshot layout: a directory holding the manifest, the FAISS index and the metadata
+SNAPSHOT_FORMAT = "localrag-snapshot"
+SNAPSHOT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+METADATA_FILE = "metadata.json"
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is invalid or does not match this system"""
+
+def _file_digest(file_path):
+    """Compute the SHA-256 of a file, reading it block by block"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            block = f.read(HASH_BLOCK_SIZE)
+            if not block:
+                break
+            digest.update(block)
+    return digest.hexdigest()
+
+def export_snapshot(storage, snapshot_dir, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Export the index and metadata of a FaissStorage as a versioned snapshot
+
+    The snapshot is written to a temporary directory next to snapshot_dir and
+    renamed into place once complete, so readers never see a partial snapshot.
+    Returns the manifest.
+    """
+    if storage.index is None:
+        storage.initialize_index()
+    # Export one published view, even if the writer publishes a new one meanwhile
+    view = storage.view
+    if view.index.ntotal != len(view.metadata):
+        raise SnapshotError("Index and metadata are out of sync, rebuild the index before exporting")
+
+    snapshot_dir = str(snapshot_dir)
+    tmp_dir = f"{snapshot_dir}.tmp-{os.getpid()}"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    try:
+        # Both files are streamed straight to disk
+        faiss.write_index(view.index, os.path.join(tmp_dir, INDEX_FILE))
+        with open(os.path.join(tmp_dir, METADATA_FILE), 'w') as f:
+            json.dump(view.metadata, f)
+
+        files = {}
+        for name in (INDEX_FILE, METADATA_FILE):
+            file_path = os.path.join(tmp_dir, name)
+            files[name] = {
+                'size': os.path.getsize(file_path),
+                'sha256': _file_digest(file_path)
+            }
+
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'version': SNAPSHOT_VERSION,
+            'created_at': time.time(),
+            'embedding_model_id': EMBEDDING_MODEL_ID,
+            'dimension': storage.dimension,
+            'chunk_size': chunk_size,
+            'chunk_overlap': chunk_overlap,
+            'total_vectors': view.index.ntotal,
+            'files': files
+        }
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        # Replace any previous snapshot at the same path
+        if os.path.exists(snapshot_dir):
+            old_dir = f"{snapshot_dir}.old-{os.getpid()}"
+            os.rename(snapshot_dir, old_dir)
+            os.rename(tmp_dir, snapshot_dir)
+            shutil.rmtree(old_dir)
+        else:
+            os.rename(tmp_dir, snapshot_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return manifest
+
+def read_manifest(snapshot_dir):
+    """Read and validate the manifest of a snapshot"""
+    manifest_path = os.path.join(str(snapshot_dir), MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise SnapshotError(f"No snapshot manifest found at {manifest_path}")
+
+    with open(manifest_path, 'r') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        raise SnapshotError(f"{snapshot_dir} is not a snapshot")
+    if manifest.get('version') != SNAPSHOT_VERSION:
+        raise SnapshotError(f"Unsupported snapshot version {manifest.get('version')} "
+                            f"(expected {SNAPSHOT_VERSION})")
+    return manifest
+
+def verify_snapshot(snapshot_dir, manifest=None):
+    """Check the size and checksum of every file in a snapshot"""
+    snapshot_dir = str(snapshot_dir)
+    if manifest is None:
+        manifest = read_manifest(snapshot_dir)
+
+    for name, info in manifest['files'].items():
+        file_path = os.path.join(snapshot_dir, name)
+        if not os.path.exists(file_path):
+            raise SnapshotError(f"Snapshot file {name} is missing")
+        if os.path.getsize(file_path) != info['size']:
+            raise SnapshotError(f"Snapshot file {name} has the wrong size")
+        if _file_digest(file_path) != info['sha256']:
+            raise SnapshotError(f"Snapshot file {name} failed checksum verification")
+
+def import_snapshot(snapshot_dir, storage, verify=True, mmap=True):
+    """Load a snapshot into a FaissStorage
+
+    With mmap the index is memory mapped from the snapshot directory rather than
+    read into memory, so even a large index is ready to serve immediately. The
+    snapshot files must stay in place while the index is in use.
+    Returns the manifest.
+    """
+    snapshot_dir = str(snapshot_dir)
+    manifest = read_manifest(snapshot_dir)
+
+    if manifest['embedding_model_id'] != EMBEDDING_MODEL_ID:
+        raise SnapshotError(f"Snapshot was built with embedding model {manifest['embedding_model_id']}, "
+                            f"but {EMBEDDING_MODEL_ID} is configured")
+    if manifest['dimension'] != storage.dimension:
+        raise SnapshotError(f"Snapshot dimension {manifest['dimension']} does not match "
+                            f"storage dimension {storage.dimension}")
+    if (manifest['chunk_size'], manifest['chunk_overlap']) != (CHUNK_SIZE, CHUNK_OVERLAP):
+        print(f"Warning: snapshot was chunked with size {manifest['chunk_size']} and overlap "
+              f"{manifest['chunk_overlap']}, but {CHUNK_SIZE} and {CHUNK_OVERLAP} are configured")
+
+    if verify:
+        verify_snapshot(snapshot_dir, manifest)
+
+    # IO_FLAG_MMAP only maps inverted lists; IO_FLAG_MMAP_IFC also maps flat index codes
+    io_flags = faiss.IO_FLAG_MMAP_IFC if mmap else 0
+    index = faiss.read_index(os.path.join(snapshot_dir, INDEX_FILE), io_flags)
+    with open(os.path.join(snapshot_dir, METADATA_FILE), 'r') as f:
+        metadata = json.load(f)
+
+    if index.ntotal != len(metadata) or index.ntotal != manifest['total_vectors']:
+        raise SnapshotError("Snapshot index and metadata are out of sync")
+
+    storage.set_index(index, metadata, mapped=mmap)
+    return manifest
@@ -2,83 +2,214 @@ import faiss
 import numpy as np
 import json
 import os
+import threading
+import time
+import tempfile
 from config.settings import FAISS_INDEX_FILE, FAISS_METADATA_FILE, EMBEDDINGS_DIR
+from embeddings.attributes import AttributeStore
 import pickle
 
+# Attempts to read a consistent index and metadata pair while another process saves
+LOAD_ATTEMPTS = 5
+
+class IndexView:
+    """Immutable snapshot of the index, its metadata and attribute columns
+
+    Once published a view is never modified, so readers can search it without
+    locks while the writer prepares the next view.
+    """
+    __slots__ = ('index', 'metadata', 'attributes', 'mapped')
+
+    def __init__(self, index, metadata, attributes, mapped=False):
+        self.index = index
+        self.metadata = metadata
+        self.attributes = attributes
+        # Memory-mapped indexes view their file and cannot be cloned or grown in place
+        self.mapped = mapped
+
 class FaissStorage:
     def __init__(self, dimension):
         """Initialize FAISS storage"""
         self.dimension = dimension
-        self.index = None
-        self.metadata = []
+        self.view = IndexView(None, [], AttributeStore())
+        
+        # Single writer: changes are staged on a copy of the current view and
+        # published by swapping self.view, which is atomic for readers
+        self.write_lock = threading.RLock()
+        self.staged = None
         
         # Create embeddings directory if it doesn't exist
         os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
         
-    def initialize_index(self):
-        """Initialize or load the FAISS index"""
-        if os.path.exists(FAISS_INDEX_FILE):
-            print("Loading existing FAISS index...")
-            self.index = faiss.read_index(str(FAISS_INDEX_FILE))
-            # Load metadata
-            if os.path.exists(FAISS_METADATA_FILE):
-                with open(FAISS_METADATA_FILE, 'r') as f:
-                    self.metadata = json.load(f)
-        else:
-            print("Creating new FAISS index...")
-            self.index = faiss.IndexFlatIP(self.dimension)
-            
-    def add_embeddings(self, embeddings, metadata_list):
-        """Add embeddings and metadata to the index"""
-        if self.index is None:
-            self.initialize_index()
-            
-        # Normalize embeddings for inner product search
-        faiss.normalize_L2(embeddings)
+    @property
+    def index(self):
+        """The FAISS index of the published view"""
+        return self.view.index
         
-        # Add to index
-        self.index.add(embeddings)
+    @property
+    def metadata(self):
+        """The chunk metadata of the published view"""
+        return self.view.metadata
         
-        # Add metadata
-        self.metadata.extend(metadata_list)
+    @property
+    def attributes(self):
+        """The attribute columns of the published view"""
+        return self.view.attributes
         
-        # Save index and metadata
-        self.save_index()
+    def initialize_index(self):
+        """Initialize or load the FAISS index"""
+        with self.write_lock:
+            if os.path.exists(FAISS_INDEX_FILE):
+                print("Loading existing FAISS index...")
+                # The two files are replaced one after the other, so another process
+                # saving right now can leave them briefly out of sync: read them again
+                for attempt in range(LOAD_ATTEMPTS):
+                    index = faiss.read_index(str(FAISS_INDEX_FILE))
+                    # Load metadata
+                    metadata = []
+                    if os.path.exists(FAISS_METADATA_FILE):
+                        with open(FAISS_METADATA_FILE, 'r') as f:
+                            metadata = json.load(f)
+                    if index.ntotal == len(metadata):
+                        self.set_index(index, metadata)
+                        return
+                    time.sleep(0.1)
+                print(f"FAISS index has {index.ntotal} vectors but metadata has {len(metadata)} entries, "
+                      f"rebuilding the index")
+            else:
+                print("Creating new FAISS index...")
+            self.set_index(faiss.IndexFlatIP(self.dimension), [])
+                
+    def set_index(self, index, metadata, mapped=False):
+        """Publish a new index and metadata, rebuilding the attribute columns
+
+        Pass mapped=True for an index read with faiss.IO_FLAG_MMAP_IFC.
+        """
+        # Filters and results address metadata by FAISS id, so both must line up
+        if index.ntotal != len(metadata):
+            raise ValueError(f"Index has {index.ntotal} vectors but metadata has {len(metadata)} entries")
+        with self.write_lock:
+            self.staged = None
+            self.view = IndexView(index, metadata, AttributeStore(metadata), mapped)
+            
+    def _ensure_index(self):
+        """Initialize the index once, even if several threads ask at the same time"""
+        if self.view.index is None:
+            with self.write_lock:
+                if self.view.index is None:
+                    self.initialize_index()
+                    
+    def add_embeddings(self, embeddings, metadata_list, save=True, publish=True):
+        """Add embeddings and metadata to the index
+
+        The additions go to a staged copy of the index. With publish=False they
+        stay invisible to readers until publish() is called, which lets a batch
+        ingestion copy the index only once.
+        """
+        self._ensure_index()
         
-    def search(self, query_embedding, k=5):
-        """Search for similar embeddings"""
-        if self.index is None:
-            self.initialize_index()
+        with self.write_lock:
+            if self.staged is None:
+                current = self.view
+                if current.mapped:
+                    # clone_index would keep viewing the mapped file, so copy through a buffer
+                    index = faiss.deserialize_index(faiss.serialize_index(current.index))
+                else:
+                    index = faiss.clone_index(current.index)
+                self.staged = IndexView(index, list(current.metadata), current.attributes.copy())
+                
+            # Normalize embeddings for inner product search
+            faiss.normalize_L2(embeddings)
+            
+            # Add to index
+            self.staged.index.add(embeddings)
             
-        if self.index.ntotal == 0:
+            # Add metadata
+            self.staged.metadata.extend(metadata_list)
+            self.staged.attributes.extend(metadata_list)
+            
+            if publish:
+                self.publish()
+                
+            # Save index and metadata
+            if save:
+                self.save_index()
+                
+    def publish(self):
+        """Make staged additions visible to readers"""
+        with self.write_lock:
+            if self.staged is not None:
+                self.view = self.staged
+                self.staged = None
+                
+    def discard(self):
+        """Drop staged additions that were not published"""
+        with self.write_lock:
+            self.staged = None
+            
+    def search(self, query_embedding, k=5, filters=None):
+        """Search for similar embeddings, optionally restricted by metadata filters"""
+        self._ensure_index()
+        
+        # Searches run lock-free against the view published when they start
+        view = self.view
+        if view.index.ntotal == 0:
             return [], []
             
         # Normalize query embedding
         faiss.normalize_L2(query_embedding)
         
-        # Search
-        distances, indices = self.index.search(query_embedding, min(k, self.index.ntotal))
-        
+        if filters:
+            # Pre-filter inside FAISS with a bitmap of the matching ids
+            mask = view.attributes.select(filters)
+            matches = int(mask.sum())
+            if matches == 0:
+                return [], []
+            bitmap = np.packbits(mask, bitorder='little')
+            # The selector takes the bitmap size in bytes
+            selector = faiss.IDSelectorBitmap(bitmap.size, faiss.swig_ptr(bitmap))
+            params = faiss.SearchParameters(sel=selector)
+            distances, indices = view.index.search(query_embedding, min(k, matches), params=params)
+        else:
+            # Search
+            distances, indices = view.index.search(query_embedding, min(k, view.index.ntotal))
+            
         # Get metadata for results
         results = []
         for i, idx in enumerate(indices[0]):
-            if idx < len(self.metadata):
+            if 0 <= idx < len(view.metadata):
                 results.append({
-                    'metadata': self.metadata[idx],
+                    'metadata': view.metadata[idx],
                     'distance': float(distances[0][i])
                 })
                 
         return results, distances[0]
         
     def save_index(self):
-        """Save the index and metadata to disk"""
-        if self.index is not None:
-            faiss.write_index(self.index, str(FAISS_INDEX_FILE))
-            with open(FAISS_METADATA_FILE, 'w') as f:
-                json.dump(self.metadata, f)
+        """Save the published index and metadata to disk"""
+        with self.write_lock:
+            view = self.view
+            if view.index is not None:
+                # Write to temporary files and rename them into place, so other
+                # processes never load a partially written file. The temporary
+                # names are unique, so concurrent saves never share a file.
+                fd, tmp_index_file = tempfile.mkstemp(dir=EMBEDDINGS_DIR, suffix='.tmp')
+                os.close(fd)
+                fd, tmp_metadata_file = tempfile.mkstemp(dir=EMBEDDINGS_DIR, suffix='.tmp')
+                os.close(fd)
+                try:
+                    faiss.write_index(view.index, tmp_index_file)
+                    with open(tmp_metadata_file, 'w') as f:
+                        json.dump(view.metadata, f)
+                    os.replace(tmp_index_file, FAISS_INDEX_FILE)
+                    os.replace(tmp_metadata_file, FAISS_METADATA_FILE)
+                except BaseException:
+                    for tmp_file in (tmp_index_file, tmp_metadata_file):
+                        if os.path.exists(tmp_file):
+                            os.remove(tmp_file)
+                    raise
                 
     def get_total_vectors(self):
         """Get the total number of vectors in the index"""
-        if self.index is None:
-            self.initialize_index()
-        return self.index.ntotal
\ No newline at end of file
+        self._ensure_index()
+        return self.view.index.ntotal
\ No newline at end of file
@@ -1,31 +1,36 @@
+import threading
 from llama_cpp import Llama
 from config.settings import MAX_NEW_TOKENS, TEMPERATURE, TOP_P
 
 # Global variable for the model
 model = None
 
+# Guards loading the model, so concurrent callers load it only once
+model_lock = threading.Lock()
+
+# A llama.cpp context is not thread-safe, so generations run one at a time
+inference_lock = threading.Lock()
+
 def load_model():
     """Load the GGUF LLM model"""
     global model
     
-    if model is None:
-        print("Loading Llama 3.2 1B GGUF model...")
-        model = Llama.from_pretrained(
-            repo_id="bartowski/Llama-3.2-1B-Instruct-GGUF",
-            filename="Llama-3.2-1B-Instruct-Q4_K_M.gguf",
-            n_ctx=2048,  # Set context window to 2048 tokens
-            verbose=False  # Reduce verbose output
-        )
-        print("GGUF model loaded successfully!")
+    with model_lock:
+        if model is None:
+            print("Loading Llama 3.2 1B GGUF model...")
+            model = Llama.from_pretrained(
+                repo_id="bartowski/Llama-3.2-1B-Instruct-GGUF",
+                filename="Llama-3.2-1B-Instruct-Q4_K_M.gguf",
+                n_ctx=2048,  # Set context window to 2048 tokens
+                verbose=False  # Reduce verbose output
+            )
+            print("GGUF model loaded successfully!")
     return model
 
 def generate_response(prompt):
     """Generate a response for a given prompt using GGUF model"""
-    global model
-    
     # Load model if not already loaded
-    if model is None:
-        model = load_model()
+    llm = load_model()
     
     # Handle RAG prompts with context
     if "Context:" in prompt and "Question:" in prompt:
@@ -53,17 +58,18 @@ def generate_response(prompt):
             full_prompt = prompt
     
     # Generate response using chat completion
-    response = model.create_chat_completion(
-        messages=[
-            {
-                "role": "user",
-                "content": full_prompt
-            }
-        ],
-        max_tokens=MAX_NEW_TOKENS,
-        temperature=TEMPERATURE,
-        top_p=TOP_P
-    )
+    with inference_lock:
+        response = llm.create_chat_completion(
+            messages=[
+                {
+                    "role": "user",
+                    "content": full_prompt
+                }
+            ],
+            max_tokens=MAX_NEW_TOKENS,
+            temperature=TEMPERATURE,
+            top_p=TOP_P
+        )
     
     # Extract and return the answer
     # Handle different response formats
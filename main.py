@@ -1,18 +1,32 @@
 import sys
 import os
+import argparse
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from rag.engine import RAGEngine
 
 def main():
+    parser = argparse.ArgumentParser(description="Optimized Local RAG System")
+    parser.add_argument("--snapshot", help="serve from this snapshot instead of processing documents")
+    parser.add_argument("--export-snapshot", help="process documents, export a snapshot to this path and exit")
+    args = parser.parse_args()
+    
     print("Initializing Optimized Local RAG System...")
     
     # Create RAG engine
     rag_engine = RAGEngine()
     
-    # Process documents
-    rag_engine.process_documents()
-    
+    if args.snapshot:
+        # Bootstrap from a snapshot built on another node
+        rag_engine.import_snapshot(args.snapshot)
+    else:
+        # Process documents
+        rag_engine.process_documents()
+        
+    if args.export_snapshot:
+        rag_engine.export_snapshot(args.export_snapshot)
+        return
+        
     # QA loop
     print("\nOptimized Local RAG System")
     print("Type 'exit' to quit")
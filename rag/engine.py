@@ -5,8 +5,10 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from rag.processor import DocumentProcessor
 from rag.retriever import Retriever
 from cache.manager import CacheManager
+from embeddings.snapshot import export_snapshot, import_snapshot
 from llm import generate_response
 import time
+import json
 
 class RAGEngine:
     def __init__(self):
@@ -18,30 +20,53 @@ class RAGEngine:
         # Initialize retriever
         self.retriever.initialize()
         
-    def process_documents(self):
-        """Process and index all documents"""
+    def process_documents(self, tags=None):
+        """Process and index all documents, recording tags on every chunk"""
         print("Loading documents...")
-        documents = self.document_processor.load_documents()
+        # Stream chunks straight from the loaders into the index in batches
+        chunks = self.document_processor.iter_chunks()
+        total = self.retriever.add_chunks(chunks, tags=tags)
         
-        if not documents:
+        if not total:
             print("No documents found to process")
             return
             
-        print(f"Processing {len(documents)} documents...")
-        self.retriever.add_documents(documents)
+        print(f"Indexed {total} chunks")
         print("Document processing complete")
         
-    def query(self, question):
-        """Process a query through the RAG pipeline"""
+    def export_snapshot(self, snapshot_dir):
+        """Export the index, metadata and settings as a versioned snapshot"""
+        print(f"Exporting snapshot to {snapshot_dir}...")
+        manifest = export_snapshot(self.retriever.faiss_storage, snapshot_dir)
+        print(f"Snapshot exported with {manifest['total_vectors']} vectors")
+        return manifest
+        
+    def import_snapshot(self, snapshot_dir, verify=True):
+        """Serve from a snapshot instead of ingesting documents"""
+        print(f"Importing snapshot from {snapshot_dir}...")
+        manifest = import_snapshot(snapshot_dir, self.retriever.faiss_storage, verify=verify)
+        print(f"Snapshot imported with {manifest['total_vectors']} vectors")
+        return manifest
+        
+    def query(self, question, filters=None):
+        """Process a query through the RAG pipeline
+
+        filters restricts retrieval by chunk metadata (see Retriever.search)
+        """
+        # Filtered queries are cached separately from unfiltered ones
+        cache_key = question
+        if filters:
+            cache_key += "\n" + json.dumps(filters, sort_keys=True, default=str)
+            
         # Check cache first
-        cached_result = self.cache_manager.get_cached_result(question)
+        cached_result = self.cache_manager.get_cached_result(cache_key)
         if cached_result:
             print("Using cached result")
             return cached_result
             
         # Retrieve relevant documents
         print("Retrieving relevant documents...")
-        results, distances = self.retriever.search(question)
+        results, distances = self.retriever.search(question, filters=filters)
         
         # Format context
         context = "\n".join([result['metadata']['content'] for result in results])
@@ -61,6 +86,6 @@ class RAGEngine:
         print(f"Response generated in {end_time - start_time:.2f} seconds")
         
         # Cache the result
-        self.cache_manager.cache_result(question, answer)
+        self.cache_manager.cache_result(cache_key, answer)
         
         return answer
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os
+import csv
+import json
+from html.parser import HTMLParser
+from config.settings import READ_BLOCK_SIZE
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # PDF support is optional
+    PdfReader = None
+
+# Registry of loaders keyed by lower-case file extension
+LOADERS = {}
+
+def register_loader(*extensions):
+    """Register a loader function for one or more file extensions"""
+    def decorator(func):
+        for ext in extensions:
+            LOADERS[ext.lower()] = func
+        return func
+    return decorator
+
+def get_loader(file_path):
+    """Get the loader for a file, or None if the file is not supported"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext in LOADERS:
+        return LOADERS[ext]
+    # Unknown extensions are read as plain text unless they look binary
+    if _looks_like_text(file_path):
+        return load_text
+    return None
+
+def _looks_like_text(file_path, sample_size=8192):
+    """Check whether a file looks like text by sniffing for NUL bytes"""
+    try:
+        with open(file_path, 'rb') as f:
+            return b'\0' not in f.read(sample_size)
+    except OSError:
+        return False
+
+@register_loader('.txt', '.text', '.log', '.md', '.markdown', '.rst')
+def load_text(file_path):
+    """Yield the text of a plain text or Markdown file block by block"""
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            yield block
+
+class _HTMLTextExtractor(HTMLParser):
+    """Collect visible text from HTML, skipping script and style content"""
+    SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+                  'section', 'article', 'header', 'footer', 'pre', 'blockquote'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self.skip_depth += 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS and self.skip_depth > 0:
+            self.skip_depth -= 1
+        elif tag in self.BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.parts.append(data)
+
+    def pop_text(self):
+        """Return the text collected so far and reset the buffer"""
+        text = "".join(self.parts)
+        self.parts = []
+        return text
+
+@register_loader('.html', '.htm', '.xhtml')
+def load_html(file_path):
+    """Yield the visible text of an HTML file, feeding the parser block by block"""
+    parser = _HTMLTextExtractor()
+    for block in load_text(file_path):
+        parser.feed(block)
+        text = parser.pop_text()
+        if text:
+            yield text
+    parser.close()
+    text = parser.pop_text()
+    if text:
+        yield text
+
+@register_loader('.jsonl', '.ndjson')
+def load_jsonl(file_path):
+    """Yield the text of each record in a JSON Lines file"""
+    with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping invalid JSON on line {line_number} of {file_path}: {e}")
+                continue
+            text = _record_text(record)
+            if text:
+                yield text + "\n"
+
+def _record_text(record):
+    """Extract the text from a JSON record"""
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict):
+        # Prefer a dedicated text field, otherwise join all string values
+        for key in ('text', 'content', 'body'):
+            if isinstance(record.get(key), str):
+                return record[key]
+        return " ".join(value for value in record.values() if isinstance(value, str))
+    return ""
+
+@register_loader('.csv', '.tsv')
+def load_csv(file_path):
+    """Yield the rows of a CSV or TSV file, one line of text per row"""
+    delimiter = '\t' if file_path.lower().endswith('.tsv') else ','
+    with open(file_path, 'r', encoding='utf-8', errors='replace', newline='') as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        rows = []
+        size = 0
+        for row in reader:
+            line = ", ".join(cell.strip() for cell in row if cell.strip())
+            if not line:
+                continue
+            rows.append(line)
+            size += len(line)
+            if size >= READ_BLOCK_SIZE:
+                yield "\n".join(rows) + "\n"
+                rows = []
+                size = 0
+        if rows:
+            yield "\n".join(rows) + "\n"
+
+@register_loader('.pdf')
+def load_pdf(file_path):
+    """Yield the text of a PDF file page by page (requires pypdf)"""
+    if PdfReader is None:
+        raise ImportError("pypdf is required to load PDF files: pip install pypdf")
+    reader = PdfReader(file_path)
+    for page in reader.pages:
+        text = page.extract_text() or ""
+        if text:
+            yield text + "\n"
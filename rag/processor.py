@@ -1,66 +1,229 @@
 import os
-from config.settings import DOCUMENTS_DIR, CHUNK_SIZE, CHUNK_OVERLAP
+import queue
+import threading
+from fnmatch import fnmatch
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import (DOCUMENTS_DIR, CHUNK_SIZE, CHUNK_OVERLAP, DOCUMENT_PATTERNS,
+                             DOCUMENTS_RECURSIVE, LOADER_WORKERS, READ_BLOCK_SIZE)
+from rag.loaders import get_loader
 import re
 
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, max_workers=LOADER_WORKERS):
         """Initialize document processor"""
-        pass
-    
-    def load_documents(self):
-        """Load all documents from the documents directory"""
-        documents = []
-        
-        if not os.path.exists(DOCUMENTS_DIR):
-            print(f"Documents directory {DOCUMENTS_DIR} does not exist")
-            return documents
-            
-        for filename in os.listdir(DOCUMENTS_DIR):
-            file_path = os.path.join(DOCUMENTS_DIR, filename)
-            if os.path.isfile(file_path):
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        documents.append({
-                            'content': content,
-                            'filename': filename,
-                            'path': file_path
-                        })
-                except Exception as e:
-                    print(f"Error reading {filename}: {e}")
-                    
+        self.max_workers = max_workers
+
+    def list_files(self, directory=None, patterns=None, recursive=None):
+        """List (name, path) pairs of documents matching the glob filters"""
+        directory = str(directory or DOCUMENTS_DIR)
+        patterns = patterns or DOCUMENT_PATTERNS
+        recursive = DOCUMENTS_RECURSIVE if recursive is None else recursive
+        files = []
+
+        if not os.path.exists(directory):
+            print(f"Documents directory {directory} does not exist")
+            return files
+
+        for root, dirs, filenames in os.walk(directory):
+            # Skip hidden directories, and do not descend at all unless recursive
+            dirs[:] = sorted(d for d in dirs if not d.startswith('.')) if recursive else []
+            for filename in sorted(filenames):
+                file_path = os.path.join(root, filename)
+                # Names are relative to the documents directory, using '/' separators
+                name = os.path.relpath(file_path, directory).replace(os.sep, '/')
+                if any(fnmatch(name, pattern) for pattern in patterns):
+                    files.append((name, file_path))
+
+        return files
+
+    def read_document(self, file_path, loader=None):
+        """Yield the text of a document incrementally using its registered loader"""
+        loader = loader or get_loader(file_path)
+        if loader is None:
+            print(f"Skipping unsupported file {file_path}")
+            return
+        yield from loader(file_path)
+
+    def load_documents(self, directory=None, patterns=None, recursive=None):
+        """Load all documents from the documents directory, reading files in parallel"""
+        files = self.list_files(directory, patterns, recursive)
+
+        def load(file_info):
+            name, file_path = file_info
+            loader = get_loader(file_path)
+            if loader is None:
+                print(f"Skipping unsupported file {file_path}")
+                return None
+            try:
+                content = "".join(self.read_document(file_path, loader))
+            except Exception as e:
+                print(f"Error reading {name}: {e}")
+                return None
+            return {
+                'content': content,
+                'filename': name,
+                'path': file_path
+            }
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            documents = [doc for doc in executor.map(load, files) if doc is not None]
+
         return documents
-    
-    def chunk_text(self, text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
-        """Split text into chunks with overlap"""
-        chunks = []
-        
-        # Split text into sentences
-        sentences = re.split(r'[.!?]+', text)
-        
+
+    def iter_chunks(self, directory=None, patterns=None, recursive=None,
+                    chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        """Yield chunk metadata for all documents without loading whole files into memory
+
+        Files are read and chunked in parallel by worker threads. Chunks are handed
+        over through a bounded queue, so memory stays flat however large the files are.
+        Chunks of different files may interleave; chunk_index is per file. Each
+        chunk is tagged with the directories its file sits in.
+
+        Close the generator when stopping early: the workers then exit at once.
+        They are daemon threads, so even an abandoned generator cannot keep the
+        process from exiting.
+        """
+        files = self.list_files(directory, patterns, recursive)
+        if not files:
+            return
+
+        file_queue = queue.Queue()
+        for file_info in files:
+            file_queue.put(file_info)
+        chunk_queue = queue.Queue(maxsize=self.max_workers * 64)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            # Give up once the consumer has stopped iterating
+            while not stop.is_set():
+                try:
+                    chunk_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def read_file(name, file_path):
+            tags = name.split('/')[:-1]
+            blocks = self.read_document(file_path)
+            for i, chunk in enumerate(self.chunk_stream(blocks, chunk_size, overlap)):
+                if not put({'content': chunk, 'source_file': name, 'chunk_index': i, 'tags': tags}):
+                    return False
+            return True
+
+        def worker():
+            try:
+                while not stop.is_set():
+                    try:
+                        name, file_path = file_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        if not read_file(name, file_path):
+                            break
+                    except Exception as e:
+                        print(f"Error reading {name}: {e}")
+            finally:
+                put(done)
+
+        workers = [threading.Thread(target=worker, name=f"iter-chunks-{i}", daemon=True)
+                   for i in range(min(self.max_workers, len(files)))]
+        try:
+            for thread in workers:
+                thread.start()
+            remaining = len(workers)
+            while remaining:
+                item = chunk_queue.get()
+                if item is done:
+                    remaining -= 1
+                else:
+                    yield item
+        finally:
+            stop.set()
+            for thread in workers:
+                if thread.is_alive():
+                    thread.join()
+
+    def chunk_stream(self, blocks, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        """Split a stream of text blocks into chunks with overlap
+
+        Only the current chunk and the unfinished sentence (at most about
+        READ_BLOCK_SIZE characters) are kept in memory. Sentences longer than
+        chunk_size are split at newlines, then hard-split, so unpunctuated input
+        such as logs still yields chunks of about chunk_size.
+        """
         current_chunk = ""
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
+        pending = ""
+
+        for block in blocks:
+            # Split text into sentences; the last one may continue in the next block
+            sentences = re.split(r'[.!?]+', pending + block)
+            pending = sentences.pop()
+            # Guard against unpunctuated input (e.g. logs) growing without bound
+            if len(pending) > READ_BLOCK_SIZE:
+                sentences.append(pending)
+                pending = ""
+            for sentence in sentences:
+                for piece in self._split_sentence(sentence, chunk_size, overlap):
+                    current_chunk = yield from self._add_sentence(current_chunk, piece, chunk_size, overlap)
+
+        for piece in self._split_sentence(pending, chunk_size, overlap):
+            current_chunk = yield from self._add_sentence(current_chunk, piece, chunk_size, overlap)
+
+        # Add the last chunk
+        if current_chunk:
+            yield current_chunk.strip()
+
+    def _split_sentence(self, sentence, chunk_size, overlap):
+        """Yield a sentence, split into pieces if it is longer than chunk_size"""
+        sentence = sentence.strip()
+        if len(sentence) <= chunk_size:
+            yield sentence
+            return
+
+        # Pieces leave room for the overlap carried over from the previous chunk
+        limit = max(chunk_size - overlap - 1, 1)
+        piece = ""
+        for line in sentence.split("\n"):
+            line = line.strip()
+            # Hard-split lines that do not fit in a piece on their own
+            while len(line) > limit:
+                if piece:
+                    yield piece
+                    piece = ""
+                yield line[:limit]
+                line = line[limit:].lstrip()
+            if not line:
                 continue
-                
-            # Check if adding this sentence would exceed chunk size
-            if len(current_chunk) + len(sentence) + 1 <= chunk_size:
-                current_chunk += " " + sentence if current_chunk else sentence
+            if piece and len(piece) + len(line) + 1 > limit:
+                yield piece
+                piece = line
             else:
-                # Add current chunk to chunks
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    
-                # Start new chunk with overlap
-                # Take last 'overlap' characters from current chunk as start of new chunk
-                if len(current_chunk) > overlap:
-                    current_chunk = current_chunk[-overlap:] + " " + sentence
-                else:
-                    current_chunk = sentence
-                    
-        # Add the last chunk
+                piece = piece + "\n" + line if piece else line
+        if piece:
+            yield piece
+
+    def _add_sentence(self, current_chunk, sentence, chunk_size, overlap):
+        """Add a sentence to the current chunk, yielding the chunk when it is full"""
+        sentence = sentence.strip()
+        if not sentence:
+            return current_chunk
+
+        # Check if adding this sentence would exceed chunk size
+        if len(current_chunk) + len(sentence) + 1 <= chunk_size:
+            return current_chunk + " " + sentence if current_chunk else sentence
+
+        # Add current chunk to chunks
         if current_chunk:
-            chunks.append(current_chunk.strip())
-            
-        return chunks
\ No newline at end of file
+            yield current_chunk.strip()
+
+        # Start new chunk with overlap
+        # Take last 'overlap' characters from current chunk as start of new chunk
+        if len(current_chunk) > overlap:
+            return current_chunk[-overlap:] + " " + sentence
+        return sentence
+
+    def chunk_text(self, text, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        """Split text into chunks with overlap"""
+        return list(self.chunk_stream([text], chunk_size, overlap))
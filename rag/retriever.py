@@ -1,12 +1,14 @@
-import numpy as np
+import time
 from embeddings.model import EmbeddingModel
 from embeddings.storage import FaissStorage
-from config.settings import TOP_K_RESULTS
+from rag.processor import DocumentProcessor
+from config.settings import TOP_K_RESULTS, EMBED_BATCH_SIZE
 
 class Retriever:
     def __init__(self):
         """Initialize retriever with embedding model and FAISS storage"""
         self.embedding_model = EmbeddingModel()
+        self.document_processor = DocumentProcessor()
         self.faiss_storage = None
         
     def initialize(self):
@@ -19,8 +21,12 @@ class Retriever:
         self.faiss_storage = FaissStorage(dim)
         self.faiss_storage.initialize_index()
         
-    def search(self, query, k=TOP_K_RESULTS):
-        """Search for relevant documents given a query"""
+    def search(self, query, k=TOP_K_RESULTS, filters=None):
+        """Search for relevant documents given a query
+
+        filters restricts the results by chunk metadata, e.g.
+        {'source': 'reports/*.pdf', 'tags': ['finance'], 'since': '2024-01-01'}
+        """
         if self.faiss_storage is None:
             self.initialize()
             
@@ -28,75 +34,61 @@ class Retriever:
         query_embedding = self.embedding_model.encode(query)
         
         # Search in FAISS
-        results, distances = self.faiss_storage.search(query_embedding, k)
+        results, distances = self.faiss_storage.search(query_embedding, k, filters)
         
         return results, distances
     
     def add_documents(self, documents):
-        """Add documents to the retrieval system"""
+        """Add loaded documents to the retrieval system"""
+        chunks = (
+            {'content': chunk, 'source_file': doc['filename'], 'chunk_index': i}
+            for doc in documents
+            for i, chunk in enumerate(self.document_processor.chunk_text(doc['content']))
+        )
+        return self.add_chunks(chunks)
+
+    def add_chunks(self, chunks, batch_size=EMBED_BATCH_SIZE, tags=None):
+        """Add a stream of chunk metadata to the retrieval system in batches
+
+        Each chunk is a metadata dict with at least a 'content' key. The extra
+        tags and the ingestion time are recorded on every chunk for filtering.
+        Returns the number of chunks added.
+        """
         if self.faiss_storage is None:
             self.initialize()
-            
-        all_chunks = []
-        all_metadata = []
-        
-        for doc in documents:
-            # Chunk the document
-            chunks = self.chunk_text(doc['content'])
-            
-            # Create embeddings for chunks
-            if chunks:
-                embeddings = self.embedding_model.encode(chunks)
-                
-                # Create metadata for each chunk
-                for i, chunk in enumerate(chunks):
-                    metadata = {
-                        'content': chunk,
-                        'source_file': doc['filename'],
-                        'chunk_index': i
-                    }
-                    all_metadata.append(metadata)
-                    
-                # Add embeddings and metadata
-                all_chunks.append(embeddings)
-                
-        if all_chunks:
-            # Combine all embeddings
-            combined_embeddings = np.vstack(all_chunks)
-            # Add to FAISS
-            self.faiss_storage.add_embeddings(combined_embeddings, all_metadata)
-            
-    def chunk_text(self, text, chunk_size=500, overlap=50):
-        """Split text into chunks with overlap"""
-        import re
-        chunks = []
-        
-        # Split text into sentences
-        sentences = re.split(r'[.!?]+', text)
-        
-        current_chunk = ""
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            # Check if adding this sentence would exceed chunk size
-            if len(current_chunk) + len(sentence) + 1 <= chunk_size:
-                current_chunk += " " + sentence if current_chunk else sentence
-            else:
-                # Add current chunk to chunks
-                if current_chunk:
-                    chunks.append(current_chunk.strip())
-                    
-                # Start new chunk with overlap
-                # Take last 'overlap' characters from current chunk as start of new chunk
-                if len(current_chunk) > overlap:
-                    current_chunk = current_chunk[-overlap:] + " " + sentence
-                else:
-                    current_chunk = sentence
-                    
-        # Add the last chunk
-        if current_chunk:
-            chunks.append(current_chunk.strip())
-            
-        return chunks
\ No newline at end of file
+
+        ingested_at = time.time()
+        total = 0
+        batch = []
+        # Hold the write lock for the whole ingestion, so batches are published together
+        with self.faiss_storage.write_lock:
+            try:
+                for chunk in chunks:
+                    chunk['tags'] = list(chunk.get('tags', []))
+                    chunk['tags'] += [tag for tag in tags or [] if tag not in chunk['tags']]
+                    chunk['ingested_at'] = ingested_at
+                    batch.append(chunk)
+                    if len(batch) >= batch_size:
+                        total += self._add_batch(batch)
+                        batch = []
+                if batch:
+                    total += self._add_batch(batch)
+            except Exception:
+                # Readers keep the last published view
+                self.faiss_storage.discard()
+                raise
+            finally:
+                # Stop a streaming source such as iter_chunks, even if this failed half-way
+                getattr(chunks, 'close', lambda: None)()
+
+            # Publish and save once at the end instead of after every batch
+            if total:
+                self.faiss_storage.publish()
+                self.faiss_storage.save_index()
+        return total
+
+    def _add_batch(self, batch):
+        """Encode a batch of chunks and stage them in FAISS without publishing or saving"""
+        embeddings = self.embedding_model.encode_documents([chunk['content'] for chunk in batch])
+        self.faiss_storage.add_embeddings(embeddings, batch, save=False, publish=False)
+        return len(batch)
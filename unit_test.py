@@ -1,11 +1,24 @@
 import sys
 import os
 import numpy as np
+import faiss
+import tempfile
+import threading
+import time
+import io
+import contextlib
+import hashlib
+import json
+import multiprocessing
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from llm import generate_response, load_model
 from embeddings.model import EmbeddingModel
 from embeddings.storage import FaissStorage
+import embeddings.storage as storage_module
+from embeddings.cache import EmbeddingCache
+from cache.manager import CacheManager
+from embeddings.snapshot import export_snapshot, import_snapshot, verify_snapshot, SnapshotError
 from rag.processor import DocumentProcessor
 from rag.retriever import Retriever
 
@@ -83,6 +96,366 @@ def test_vector_storage():
         print(f"[FAIL] Vector storage test failed: {e}\n")
         return False
 
+def test_filtered_search():
+    """Test metadata-filtered search in the FAISS storage"""
+    print("Testing Filtered Search...")
+    print("-" * 30)
+    
+    try:
+        dim = 16
+        storage = FaissStorage(dim)
+        storage.set_index(faiss.IndexFlatIP(dim), [])
+        vectors = np.random.rand(20, dim).astype('float32')
+        metadata = []
+        for i in range(20):
+            metadata.append({
+                "content": f"Chunk {i}",
+                "source_file": "reports/q1.md" if i % 4 == 0 else "notes.txt",
+                "chunk_index": i,
+                "tags": ["finance"] if i % 2 == 0 else [],
+                "ingested_at": 1000.0 + i
+            })
+        storage.add_embeddings(vectors.copy(), metadata, save=False)
+        
+        results, _ = storage.search(vectors[1:2].copy(), k=10, filters={"source": "reports/*"})
+        assert results and all(r['metadata']['source_file'] == "reports/q1.md" for r in results)
+        print(f"[PASS] Source glob filter returned {len(results)} results")
+        
+        results, _ = storage.search(vectors[1:2].copy(), k=10, filters={"tags": ["finance"], "since": 1010})
+        assert results and all(r['metadata']['chunk_index'] >= 10 and r['metadata']['chunk_index'] % 2 == 0
+                               for r in results)
+        print("[PASS] Tag and ingestion date filters combined")
+        
+        results, _ = storage.search(vectors[1:2].copy(), k=10, filters={"source": "missing/*"})
+        assert results == []
+        print("[PASS] Filter without matches returns no results")
+        
+        # Every FAISS id must have metadata, or filters would address the wrong chunks
+        try:
+            FaissStorage(dim).set_index(storage.index, metadata[:10])
+            raise AssertionError("index with missing metadata was accepted")
+        except ValueError:
+            print("[PASS] Index without matching metadata rejected")
+        print("[PASS] Filtered search test passed\n")
+        return True
+    except Exception as e:
+        print(f"[FAIL] Filtered search test failed: {e}\n")
+        return False
+
+def test_concurrent_access():
+    """Stress test concurrent readers, a writer and the query cache"""
+    print("Testing Concurrent Access...")
+    print("-" * 30)
+    
+    try:
+        dim = 32
+        storage = FaissStorage(dim)
+        storage.set_index(faiss.IndexFlatIP(dim), [])
+        vectors = np.random.rand(4000, dim).astype('float32')
+        faiss.normalize_L2(vectors)
+        
+        def add(start, end):
+            metadata = [{"content": f"Chunk {i}", "source_file": "stress.txt", "chunk_index": i}
+                        for i in range(start, end)]
+            storage.add_embeddings(vectors[start:end].copy(), metadata, save=False)
+            
+        add(0, 1000)
+        errors = []
+        stop = threading.Event()
+        
+        def reader():
+            rng = np.random.default_rng()
+            while not stop.is_set():
+                view = storage.view
+                if view.index.ntotal != len(view.metadata):
+                    errors.append("published view has mismatched index and metadata")
+                i = int(rng.integers(view.index.ntotal))
+                results, _ = storage.search(vectors[i:i + 1].copy(), k=1)
+                # Every vector is its own nearest neighbour in any later view
+                if not results or results[0]['metadata']['chunk_index'] != i:
+                    errors.append(f"wrong result for vector {i}")
+                    
+        def writer():
+            for start in range(1000, 4000, 250):
+                add(start, start + 250)
+                
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        writer_thread = threading.Thread(target=writer)
+        writer_thread.start()
+        writer_thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        assert not errors, errors[0]
+        assert storage.get_total_vectors() == 4000
+        print("[PASS] 4 readers saw consistent views while the writer published 12 batches")
+        
+        # Readers must not wait for the writer: hold the write lock with staged
+        # additions and check that searches still finish against the old view
+        held = threading.Event()
+        release = threading.Event()
+        
+        def blocked_writer():
+            with storage.write_lock:
+                extra = np.random.rand(10, dim).astype('float32')
+                metadata = [{"content": "Staged", "source_file": "stress.txt", "chunk_index": 4000 + i}
+                            for i in range(10)]
+                storage.add_embeddings(extra, metadata, save=False, publish=False)
+                held.set()
+                release.wait()
+                storage.publish()
+                
+        writer_thread = threading.Thread(target=blocked_writer)
+        writer_thread.start()
+        held.wait()
+        read_results = []
+        
+        def blocked_reader(i):
+            results, _ = storage.search(vectors[i:i + 1].copy(), k=1)
+            read_results.append((i, results[0]['metadata']['chunk_index'], storage.get_total_vectors()))
+            
+        readers = [threading.Thread(target=blocked_reader, args=(i,)) for i in range(0, 4000, 500)]
+        for thread in readers:
+            thread.start()
+        for thread in readers:
+            thread.join(timeout=10)
+        finished = not any(thread.is_alive() for thread in readers)
+        release.set()
+        writer_thread.join()
+        for thread in readers:
+            thread.join()
+        assert finished, "searches blocked while the write lock was held"
+        assert all(found == i and total == 4000 for i, found, total in read_results)
+        assert storage.get_total_vectors() == 4010
+        print(f"[PASS] {len(read_results)} searches finished on the old view while the writer held the lock")
+        
+        # Read throughput with 1 and 4 threads over the final view (informational)
+        def queries_per_second(thread_count, per_thread=300):
+            def run():
+                for i in range(per_thread):
+                    storage.search(vectors[i:i + 1].copy(), k=5)
+            threads = [threading.Thread(target=run) for _ in range(thread_count)]
+            start_time = time.time()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return thread_count * per_thread / (time.time() - start_time)
+        single = queries_per_second(1)
+        multi = queries_per_second(4)
+        print(f"[INFO] Read throughput: {single:.0f} q/s with 1 thread, {multi:.0f} q/s with 4 threads")
+        
+        # Concurrent writers and readers of the same cache entries
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache_manager = CacheManager()
+            cache_manager.cache_dir = cache_dir
+            answers = {f"question {i}": "answer " * 2000 + str(i) for i in range(5)}
+            output = io.StringIO()
+            
+            def cache_worker():
+                for _ in range(50):
+                    for question, answer in answers.items():
+                        cache_manager.cache_result(question, answer)
+                        cached = cache_manager.get_cached_result(question)
+                        if cached != answer:
+                            errors.append(f"torn cache read for {question}")
+                            
+            with contextlib.redirect_stdout(output):
+                workers = [threading.Thread(target=cache_worker) for _ in range(4)]
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+            assert not errors, errors[0]
+            assert "Error" not in output.getvalue(), output.getvalue()
+            assert not [f for f in os.listdir(cache_dir) if f.endswith('.tmp')]
+        print("[PASS] Concurrent cache writes are atomic")
+        
+        # An index and metadata pair caught between the two renames of a save is not
+        # loaded as is; with no consistent pair appearing the index is rebuilt
+        with tempfile.TemporaryDirectory() as index_dir:
+            index_file = storage_module.FAISS_INDEX_FILE
+            metadata_file = storage_module.FAISS_METADATA_FILE
+            embeddings_dir = storage_module.EMBEDDINGS_DIR
+            storage_module.FAISS_INDEX_FILE = os.path.join(index_dir, "faiss_index.bin")
+            storage_module.FAISS_METADATA_FILE = os.path.join(index_dir, "metadata.json")
+            storage_module.EMBEDDINGS_DIR = index_dir
+            try:
+                faiss.write_index(storage.index, storage_module.FAISS_INDEX_FILE)
+                with open(storage_module.FAISS_METADATA_FILE, "w") as f:
+                    json.dump(storage.metadata[:100], f)
+                with contextlib.redirect_stdout(io.StringIO()):
+                    reloaded = FaissStorage(dim)
+                    reloaded.initialize_index()
+                assert reloaded.get_total_vectors() == 0
+                print("[PASS] Out-of-sync index and metadata files are not loaded")
+                
+                # Storages without a shared lock (like separate processes) saving at once
+                # write their own temporary files and never rename a half-written one
+                smaller = FaissStorage(dim)
+                smaller.set_index(faiss.IndexFlatIP(dim), [])
+                smaller.add_embeddings(vectors[:500].copy(), storage.metadata[:500], save=False)
+                save_errors = []
+                
+                def saver(source):
+                    try:
+                        for _ in range(10):
+                            source.save_index()
+                    except Exception as e:
+                        save_errors.append(e)
+                        
+                savers = [threading.Thread(target=saver, args=(source,)) for source in (storage, smaller)]
+                for thread in savers:
+                    thread.start()
+                for thread in savers:
+                    thread.join()
+                assert not save_errors, save_errors[0]
+                saved = faiss.read_index(storage_module.FAISS_INDEX_FILE).ntotal
+                assert saved in (smaller.get_total_vectors(), storage.get_total_vectors())
+                assert not [f for f in os.listdir(index_dir) if f.endswith('.tmp')]
+                print("[PASS] Concurrent saves use separate temporary files")
+            finally:
+                storage_module.FAISS_INDEX_FILE = index_file
+                storage_module.FAISS_METADATA_FILE = metadata_file
+                storage_module.EMBEDDINGS_DIR = embeddings_dir
+        print("[PASS] Concurrent access test passed\n")
+        return True
+    except Exception as e:
+        print(f"[FAIL] Concurrent access test failed: {e}\n")
+        return False
+
+def test_snapshot():
+    """Test snapshot export and import of the index bundle"""
+    print("Testing Index Snapshots...")
+    print("-" * 30)
+    
+    try:
+        dim = 16
+        source = FaissStorage(dim)
+        source.set_index(faiss.IndexFlatIP(dim), [])
+        vectors = np.random.rand(5, dim).astype('float32')
+        metadata = [{"content": f"Chunk {i}", "source_file": "test.txt", "chunk_index": i} for i in range(5)]
+        source.add_embeddings(vectors.copy(), metadata, save=False)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            snapshot_dir = os.path.join(tmp_dir, "snapshot")
+            manifest = export_snapshot(source, snapshot_dir)
+            print(f"[PASS] Exported snapshot version {manifest['version']} with {manifest['total_vectors']} vectors")
+            
+            target = FaissStorage(dim)
+            import_snapshot(snapshot_dir, target)
+            results, _ = target.search(vectors[2:3].copy(), k=1)
+            assert target.get_total_vectors() == 5
+            assert results[0]['metadata']['chunk_index'] == 2
+            print("[PASS] Imported snapshot serves searches")
+            
+            if os.path.exists("/proc/self/maps"):
+                index_file = os.path.realpath(os.path.join(snapshot_dir, "index.faiss"))
+                with open("/proc/self/maps") as f:
+                    assert index_file in f.read(), "snapshot index is not memory mapped"
+                print("[PASS] Snapshot index is memory mapped")
+            
+            # Adding to a memory-mapped index works on a copy and leaves the snapshot untouched
+            target.add_embeddings(np.random.rand(1, dim).astype('float32'),
+                                  [{"content": "New chunk", "source_file": "new.txt", "chunk_index": 0}], save=False)
+            assert target.get_total_vectors() == 6
+            verify_snapshot(snapshot_dir)
+            print("[PASS] Writes after import leave the snapshot unchanged")
+            
+            # A corrupted snapshot must be rejected
+            with open(os.path.join(snapshot_dir, "metadata.json"), "a") as f:
+                f.write(" ")
+            try:
+                import_snapshot(snapshot_dir, FaissStorage(dim))
+                raise AssertionError("corrupted snapshot was imported")
+            except SnapshotError:
+                print("[PASS] Corrupted snapshot rejected")
+        print("[PASS] Snapshot test passed\n")
+        return True
+    except Exception as e:
+        print(f"[FAIL] Snapshot test failed: {e}\n")
+        return False
+
+def _text_vector(text, dim):
+    """Deterministic vector for a text, so any process can check a cached embedding"""
+    return np.frombuffer(hashlib.sha256(text.encode()).digest(), dtype='uint8')[:dim].astype('float32')
+
+def _embedding_cache_worker(cache_dir, dim, tag):
+    """Append to a shared embedding cache and check this process's own lookups"""
+    cache = EmbeddingCache(dim, model_id="test-model", cache_dir=cache_dir)
+    for batch in range(20):
+        texts = [f"{tag}-{batch}-{i}" for i in range(10)] + [f"shared-{batch}"]
+        expected = np.stack([_text_vector(text, dim) for text in texts])
+        cache.put_many(texts, expected)
+        cached, missing = cache.get_many(texts)
+        if missing or not np.array_equal(cached, expected):
+            sys.exit(1)
+
+def test_embedding_cache():
+    """Test the persistent embedding cache"""
+    print("Testing Embedding Cache...")
+    print("-" * 30)
+    
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            dim = 8
+            cache = EmbeddingCache(dim, model_id="test-model", cache_dir=cache_dir)
+            embeddings = np.random.rand(2, dim).astype('float32')
+            cache.put_many(["first chunk", "second chunk"], embeddings)
+            print(f"[PASS] Cached {len(cache)} embeddings")
+            
+            # Reopen from disk and look up a mix of cached and new texts
+            reopened = EmbeddingCache(dim, model_id="test-model", cache_dir=cache_dir)
+            cached, missing = reopened.get_many(["second chunk", "new chunk"])
+            assert missing == [1]
+            assert np.allclose(cached[0], embeddings[1])
+            print("[PASS] Embeddings reused after reopening the cache")
+            
+            # The same text under another model is a different key
+            other = EmbeddingCache(dim, model_id="other-model", cache_dir=cache_dir)
+            _, missing = other.get_many(["first chunk"])
+            assert missing == [0]
+            print("[PASS] Cache keys include the model id")
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # Several processes appending to the same cache files
+            dim = 8
+            processes = [multiprocessing.Process(target=_embedding_cache_worker, args=(cache_dir, dim, tag))
+                         for tag in ("a", "b", "c")]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            assert all(process.exitcode == 0 for process in processes), "a process read wrong embeddings"
+            texts = [f"{tag}-{batch}-{i}" for tag in "abc" for batch in range(20) for i in range(10)]
+            cached, missing = EmbeddingCache(dim, model_id="test-model", cache_dir=cache_dir).get_many(texts)
+            assert not missing
+            assert np.array_equal(cached, np.stack([_text_vector(text, dim) for text in texts]))
+            print("[PASS] Processes sharing the cache read back their own embeddings")
+        
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # A process that dies mid-append leaves a partial row behind
+            dim = 4
+            cache = EmbeddingCache(dim, model_id="test-model", cache_dir=cache_dir)
+            cache.put_many(["x"], np.ones((1, dim), dtype='float32'))
+            with open(cache.vectors_file, 'ab') as f:
+                f.write(b"\xff" * 8)
+            with open(cache.keys_file, 'ab') as f:
+                f.write(b"\xff" * 5)
+            cache.put_many(["y"], np.full((1, dim), 7, dtype='float32'))
+            for reader in (cache, EmbeddingCache(dim, model_id="test-model", cache_dir=cache_dir)):
+                cached, missing = reader.get_many(["x", "y"])
+                assert not missing
+                assert np.array_equal(cached, [[1] * dim, [7] * dim])
+            print("[PASS] Partial row left by a crashed process trimmed before appending")
+        print("[PASS] Embedding cache test passed\n")
+        return True
+    except Exception as e:
+        print(f"[FAIL] Embedding cache test failed: {e}\n")
+        return False
+
 def test_chunking():
     """Test the document chunking functionality"""
     print("Testing Document Chunking...")
@@ -101,6 +474,78 @@ def test_chunking():
         print(f"[FAIL] Document chunking test failed: {e}\n")
         return False
 
+def test_document_loaders():
+    """Test the multi-format document loaders and streaming chunking"""
+    print("Testing Document Loaders...")
+    print("-" * 30)
+    
+    try:
+        with tempfile.TemporaryDirectory() as docs_dir:
+            os.makedirs(os.path.join(docs_dir, "nested"))
+            with open(os.path.join(docs_dir, "notes.txt"), "w", encoding="utf-8") as f:
+                f.write("Plain text document. " * 50)
+            with open(os.path.join(docs_dir, "nested", "page.html"), "w", encoding="utf-8") as f:
+                f.write("<html><script>skip()</script><p>Visible HTML text.</p></html>")
+            with open(os.path.join(docs_dir, "records.jsonl"), "w", encoding="utf-8") as f:
+                f.write('{"text": "First record."}\n{"text": "Second record."}\n')
+            with open(os.path.join(docs_dir, "blob.bin"), "wb") as f:
+                f.write(b"\x00\x01\x02")
+            
+            processor = DocumentProcessor()
+            documents = {doc['filename']: doc['content'] for doc in processor.load_documents(docs_dir)}
+            assert set(documents) == {"notes.txt", "nested/page.html", "records.jsonl"}
+            assert "skip()" not in documents["nested/page.html"]
+            print(f"[PASS] Loaded {len(documents)} documents recursively, binary file skipped")
+            
+            html_only = processor.load_documents(docs_dir, patterns=["*.html"])
+            assert [doc['filename'] for doc in html_only] == ["nested/page.html"]
+            print("[PASS] Glob filter applied")
+            
+            text = documents["notes.txt"]
+            blocks = [text[i:i + 37] for i in range(0, len(text), 37)]
+            assert list(processor.chunk_stream(blocks, 100, 10)) == processor.chunk_text(text, 100, 10)
+            print("[PASS] Streaming chunks match whole-text chunks")
+            
+            # Unpunctuated input (e.g. logs) must still be split into small chunks
+            log_blocks = ["2024-01-01 12:00:00 INFO request served in 12 ms\n" * 400] * 5
+            log_chunks = list(processor.chunk_stream(log_blocks, 100, 10))
+            assert log_chunks and max(len(c) for c in log_chunks) <= 100 + 10
+            long_line_chunks = list(processor.chunk_stream(["x" * 5000] * 3, 100, 10))
+            assert max(len(c) for c in long_line_chunks) <= 100 + 10
+            print(f"[PASS] Unpunctuated input split into {len(log_chunks)} bounded chunks")
+            
+            chunks = list(processor.iter_chunks(docs_dir))
+            print(f"[PASS] Streamed {len(chunks)} chunks")
+
+            # A consumer failing part-way must stop the loader threads, not leave them blocked
+            for i in range(8):
+                with open(os.path.join(docs_dir, f"bulk{i}.txt"), "w", encoding="utf-8") as f:
+                    f.write("Bulk sentence to fill the chunk queue. " * 5000)
+
+            def failing_encode(texts):
+                raise RuntimeError("encoder failed")
+
+            retriever = Retriever()
+            retriever.embedding_model.encode_documents = failing_encode
+            retriever.faiss_storage = FaissStorage(4)
+            retriever.faiss_storage.set_index(faiss.IndexFlatIP(4), [])
+            # Keep a reference, so the stream is not stopped by garbage collection
+            bulk_chunks = processor.iter_chunks(docs_dir, patterns=["bulk*.txt"])
+            try:
+                retriever.add_chunks(bulk_chunks, batch_size=4)
+                assert False, "add_chunks should re-raise the encoder error"
+            except RuntimeError:
+                pass
+            loaders = [t for t in threading.enumerate() if t.name.startswith("iter-chunks-")]
+            assert not loaders, f"{len(loaders)} loader threads still running"
+            assert retriever.faiss_storage.get_total_vectors() == 0
+            print("[PASS] Loader threads stopped after the consumer failed")
+        print("[PASS] Document loaders test passed\n")
+        return True
+    except Exception as e:
+        print(f"[FAIL] Document loaders test failed: {e}\n")
+        return False
+
 def test_retrieval():
     """Test the document retrieval functionality"""
     print("Testing Document Retrieval...")
@@ -134,7 +579,12 @@ def main():
         test_model_inference,
         test_embedding_model,
         test_vector_storage,
+        test_filtered_search,
+        test_concurrent_access,
+        test_snapshot,
+        test_embedding_cache,
         test_chunking,
+        test_document_loaders,
         test_retrieval
     ]
     